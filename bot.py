@@ -4,26 +4,45 @@ Calculates optimal sleep/wake times based on 90-minute sleep cycles.
 """
 
 import asyncio
+import functools
 import logging
+import re
 from datetime import datetime, timedelta
 import pytz
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.constants import ParseMode
 from telegram.ext import (
+    AIORateLimiter,
     Application,
     CommandHandler,
     CallbackQueryHandler,
     MessageHandler,
     filters,
     ContextTypes,
-    ConversationHandler,
 )
-from config import BOT_TOKEN
+from telegram.request import HTTPXRequest
+try:
+    import uvloop
+except ImportError:  # optional; not available on Windows
+    uvloop = None
+try:
+    import orjson
+except ImportError:  # optional; stdlib json is used instead
+    orjson = None
+from config import BOT_TOKEN, PORT, WEBHOOK_HOST
 
 # ── Logging ──────────────────────────────────────────────────────────────────
 logging.basicConfig(
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    datefmt="%H:%M:%S",
     level=logging.INFO,
 )
+# The format above doesn't use thread/process info or caller location, so
+# skip collecting them for every record.
+logging.logThreads = False
+logging.logProcesses = False
+logging.logMultiprocessing = False
+logging._srcfile = None
 logger = logging.getLogger(__name__)
 
 # ── Constants ─────────────────────────────────────────────────────────────────
@@ -33,9 +52,82 @@ MIN_CYCLES = 4                 # minimum healthy cycles  (6 h)
 MAX_CYCLES = 6                 # maximum recommended cycles (9 h)
 LOCAL_TZ = pytz.timezone("Asia/Bangkok")  # UTC+7 (Hanoi, Bangkok, Jakarta)
 
-# Conversation states
-WAITING_FOR_WAKE_TIME = 1
-WAITING_FOR_SLEEP_TIME = 2
+# Cycle offsets used by the calculators, ordered as they are displayed
+_BED_OFFSETS = tuple(
+    (timedelta(minutes=c * SLEEP_CYCLE_MINUTES + FALL_ASLEEP_MINUTES), c)
+    for c in range(MAX_CYCLES, MIN_CYCLES - 1, -1)
+)
+_WAKE_OFFSETS = tuple(
+    (timedelta(minutes=c * SLEEP_CYCLE_MINUTES), c)
+    for c in range(MIN_CYCLES, MAX_CYCLES + 1)
+)
+_FALL_ASLEEP_TD = timedelta(minutes=FALL_ASLEEP_MINUTES)
+
+# Static message scaffolding shared by the result builders
+_EMOJIS = ("🥇", "🥈", "🥉", "🏅", "🎖", "⭐")
+_CYCLE_HOURS = {
+    c: f"{c * SLEEP_CYCLE_MINUTES / 60:.1f}h" for c in range(MIN_CYCLES, MAX_CYCLES + 1)
+}
+_FOOTER = (
+    "\n💡 Each cycle lasts ~90 minutes.\n"
+    f"⏳ +{FALL_ASLEEP_MINUTES} min to fall asleep is already included."
+)
+
+# Result rows with everything but the clock time baked in ("%s" slot)
+_BED_ROW_TEMPLATES = tuple(
+    f"{emoji} *%s*  —  {c} cycles ({_CYCLE_HOURS[c]})"
+    for emoji, (_, c) in zip(_EMOJIS, _BED_OFFSETS)
+)
+_WAKE_ROW_TEMPLATES = tuple(
+    f"{emoji} *%s*  —  {c} cycles ({_CYCLE_HOURS[c]})"
+    for emoji, (_, c) in zip(_EMOJIS, _WAKE_OFFSETS)
+)
+
+_SEPARATOR = "\n────────────────────\n"  # blank line either side once joined
+
+# Accepted time formats: "7:30 AM", "7:30am", "22:00", "11 pm", "11pm"
+_TIME_RE = re.compile(r"^\s*(\d{1,2})(?::(\d{2}))?\s*([AaPp][Mm])?\s*$")
+
+# ── Static texts ──────────────────────────────────────────────────────────────
+_START_TEXT = (
+    "👋 Welcome to *Sleep Calculator Bot*!\n\n"
+    "I use 90-minute sleep cycles to help you wake up feeling refreshed.\n\n"
+    "What would you like to do?"
+)
+
+_HELP_TEXT = (
+    "*Sleep Calculator Bot – Help*\n\n"
+    "📌 *Commands*\n"
+    "/start – Show the main menu\n"
+    "/wake – Calculate bedtimes for a desired wake-up time\n"
+    "/sleep – Calculate wake-up times for a given bedtime\n"
+    "/now – Calculate wake-up times if you sleep right now\n"
+    "/info – Learn about sleep cycles\n"
+    "/help – Show this message\n\n"
+    "📌 *Time formats accepted*\n"
+    "`7:30 AM`  `7:30 am`  `07:30`  `22:00`"
+)
+
+_ASK_WAKE_PROMPT = "⏰ What time do you want to *wake up*?\n\nExamples: `7:00 AM`, `06:30`, `7:30 am`"
+_ASK_SLEEP_PROMPT = "🛏 What time are you planning to *go to bed*?\n\nExamples: `10:30 PM`, `22:30`, `11 pm`"
+
+_PARSE_FAIL_WAKE = "❌ I couldn't understand that time.\nTry formats like `7:30 AM`, `07:30`, or `22:00`."
+_PARSE_FAIL_SLEEP = "❌ I couldn't understand that time.\nTry formats like `10:30 PM`, `22:30`, or `23:00`."
+_PARSE_FAIL_DEFAULT = "🤔 I didn't understand that. Use /start to open the menu or type a time like `7:30 AM`."
+
+# Shared by /info and the "About sleep cycles" button
+_INFO_TEXT = (
+    "🧠 *About Sleep Cycles*\n\n"
+    "Your sleep consists of repeated ~90-minute cycles, each containing:\n"
+    "• Light sleep\n"
+    "• Deep sleep (REM)\n\n"
+    "Waking up *between* cycles (not in the middle) means you feel rested.\n\n"
+    "✅ *Ideal sleep* = 4–6 full cycles\n"
+    "⏰ *6 cycles* = 9 hours  (most refreshing)\n"
+    "⏰ *5 cycles* = 7.5 hours (recommended)\n"
+    "⏰ *4 cycles* = 6 hours   (minimum)\n\n"
+    "💡 An average person takes ~14 minutes to fall asleep, so that's built into every calculation."
+)
 
 
 # ── Helper functions ──────────────────────────────────────────────────────────
@@ -46,82 +138,108 @@ def now_local() -> datetime:
 
 def calculate_bedtimes(wake_time: datetime) -> list[datetime]:
     """Return a list of ideal bedtimes for a given wake-up time."""
-    bedtimes = []
-    for cycles in range(MAX_CYCLES, MIN_CYCLES - 1, -1):
-        total_sleep = timedelta(minutes=cycles * SLEEP_CYCLE_MINUTES + FALL_ASLEEP_MINUTES)
-        bedtime = wake_time - total_sleep
-        bedtimes.append((bedtime, cycles))
-    return bedtimes
+    return [(wake_time - offset, cycles) for offset, cycles in _BED_OFFSETS]
 
 
 def calculate_wake_times(sleep_time: datetime) -> list[datetime]:
     """Return a list of ideal wake-up times for a given bedtime."""
-    wake_times = []
-    fall_asleep_time = sleep_time + timedelta(minutes=FALL_ASLEEP_MINUTES)
-    for cycles in range(MIN_CYCLES, MAX_CYCLES + 1):
-        total_sleep = timedelta(minutes=cycles * SLEEP_CYCLE_MINUTES)
-        wake_time = fall_asleep_time + total_sleep
-        wake_times.append((wake_time, cycles))
-    return wake_times
+    fall_asleep_time = sleep_time + _FALL_ASLEEP_TD
+    return [(fall_asleep_time + offset, cycles) for offset, cycles in _WAKE_OFFSETS]
+
+
+@functools.lru_cache(maxsize=1440)  # one entry per minute of the day
+def _fmt_hm(hour: int, minute: int) -> str:
+    return datetime(1970, 1, 1, hour, minute).strftime("%I:%M %p")
 
 
 def format_time(dt: datetime) -> str:
-    return dt.strftime("%I:%M %p")
+    return _fmt_hm(dt.hour, dt.minute)
+
+
+def parse_time(text: str, now: datetime | None = None) -> datetime | None:
+    """Parse common time formats (e.g. '7:30', '7:30 AM', '22:00').
+
+    The result falls on the date of ``now``; pass it in if the caller has
+    already read the clock, otherwise it is read only when the text parses.
+    """
+    m = _TIME_RE.match(text)
+    if m is None:
+        return None
+    h, mm, ap = m.groups()
+    h = int(h)
+    minute = int(mm or 0)
+    if ap:
+        # 12-hour clock: hour must be 1–12
+        if not 1 <= h <= 12:
+            return None
+        h = h % 12 + (12 if ap.lower() == "pm" else 0)
+    elif mm is None or h > 23:
+        # 24-hour clock needs minutes ("7" alone is ambiguous)
+        return None
+    if minute > 59:
+        return None
+    if now is None:
+        now = now_local()
+    return now.replace(hour=h, minute=minute, second=0, microsecond=0)
 
 
-def cycles_to_hours(cycles: int) -> str:
-    hours = (cycles * SLEEP_CYCLE_MINUTES) / 60
-    return f"{hours:.1f}h"
+def _append_bedtime_lines(out: list[str], bedtimes: list, wake_time: datetime) -> None:
+    out.append(f"⏰ Wake-up time: *{format_time(wake_time)}*\n")
+    out.append("🛏 Recommended bedtimes (fall asleep at):\n")
+    out.extend(tpl % format_time(bedtime) for tpl, (bedtime, _) in zip(_BED_ROW_TEMPLATES, bedtimes))
+    out.append(_FOOTER)
 
 
-def parse_time(text: str) -> datetime | None:
-    """Parse common time formats (e.g. '7:30', '7:30 AM', '22:00')."""
-    text = text.strip()
-    formats = ["%I:%M %p", "%I:%M%p", "%H:%M", "%I %p", "%I%p"]
-    now = now_local()
-    for fmt in formats:
-        try:
-            t = datetime.strptime(text, fmt)
-            return now.replace(hour=t.hour, minute=t.minute, second=0, microsecond=0)
-        except ValueError:
-            continue
-    return None
+def _append_wake_lines(out: list[str], wake_times: list, sleep_time: datetime) -> None:
+    out.append(f"🛏 Bedtime: *{format_time(sleep_time)}*\n")
+    out.append("⏰ Recommended wake-up times:\n")
+    out.extend(tpl % format_time(wake_time) for tpl, (wake_time, _) in zip(_WAKE_ROW_TEMPLATES, wake_times))
+    out.append(_FOOTER)
 
 
 def build_bedtime_message(bedtimes: list, wake_time: datetime) -> str:
-    lines = [
-        f"⏰ Wake-up time: *{format_time(wake_time)}*\n",
-        "🛏 Recommended bedtimes (fall asleep at):\n",
-    ]
-    emojis = ["🥇", "🥈", "🥉", "🏅", "🎖", "⭐"]
-    for i, (bedtime, cycles) in enumerate(bedtimes):
-        emoji = emojis[i] if i < len(emojis) else "•"
-        lines.append(
-            f"{emoji} *{format_time(bedtime)}*  —  {cycles} cycles ({cycles_to_hours(cycles)})"
-        )
-    lines.append("\n💡 Each cycle lasts ~90 minutes.")
-    lines.append(f"⏳ +{FALL_ASLEEP_MINUTES} min to fall asleep is already included.")
-    return "\n".join(lines)
+    out: list[str] = []
+    _append_bedtime_lines(out, bedtimes, wake_time)
+    return "\n".join(out)
 
 
 def build_wake_message(wake_times: list, sleep_time: datetime) -> str:
-    lines = [
-        f"🛏 Bedtime: *{format_time(sleep_time)}*\n",
-        "⏰ Recommended wake-up times:\n",
-    ]
-    emojis = ["🥇", "🥈", "🥉", "🏅", "🎖", "⭐"]
-    for i, (wake_time, cycles) in enumerate(wake_times):
-        emoji = emojis[i] if i < len(emojis) else "•"
-        lines.append(
-            f"{emoji} *{format_time(wake_time)}*  —  {cycles} cycles ({cycles_to_hours(cycles)})"
-        )
-    lines.append("\n💡 Each cycle lasts ~90 minutes.")
-    lines.append(f"⏳ +{FALL_ASLEEP_MINUTES} min to fall asleep is already included.")
-    return "\n".join(lines)
+    out: list[str] = []
+    _append_wake_lines(out, wake_times, sleep_time)
+    return "\n".join(out)
 
 
-def main_menu_keyboard() -> InlineKeyboardMarkup:
-    keyboard = [
+def _clock(hour: int, minute: int) -> datetime:
+    # Any fixed date works; it never appears in the output.
+    return datetime(2000, 1, 2, hour, minute)
+
+
+# Replies only show clock times, so each one depends on nothing but the input's
+# hour and minute; 1440 entries cover every minute of the day.
+@functools.lru_cache(maxsize=1440)
+def _rendered_bedtime_msg(hour: int, minute: int) -> str:
+    wake_time = _clock(hour, minute)
+    return build_bedtime_message(calculate_bedtimes(wake_time), wake_time)
+
+
+@functools.lru_cache(maxsize=1440)
+def _rendered_wake_msg(hour: int, minute: int) -> str:
+    sleep_time = _clock(hour, minute)
+    return build_wake_message(calculate_wake_times(sleep_time), sleep_time)
+
+
+@functools.lru_cache(maxsize=1440)
+def _rendered_both_msg(hour: int, minute: int) -> str:
+    t = _clock(hour, minute)
+    out: list[str] = []
+    _append_bedtime_lines(out, calculate_bedtimes(t), t)
+    out.append(_SEPARATOR)
+    _append_wake_lines(out, calculate_wake_times(t), t)
+    return "\n".join(out)
+
+
+_MAIN_MENU = InlineKeyboardMarkup(
+    [
         [
             InlineKeyboardButton("⏰ I want to WAKE UP at…", callback_data="ask_wake"),
         ],
@@ -135,228 +253,195 @@ def main_menu_keyboard() -> InlineKeyboardMarkup:
             InlineKeyboardButton("ℹ️ About sleep cycles", callback_data="info"),
         ],
     ]
-    return InlineKeyboardMarkup(keyboard)
+)
+
+
+# Keyword arguments for every reply that shows the main menu
+_REPLY_KW = {"parse_mode": ParseMode.MARKDOWN, "reply_markup": _MAIN_MENU}
+
+
+def main_menu_keyboard() -> InlineKeyboardMarkup:
+    """Return the shared main-menu keyboard (built once at import)."""
+    return _MAIN_MENU
 
 
 # ── Command handlers ──────────────────────────────────────────────────────────
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    text = (
-        "👋 Welcome to *Sleep Calculator Bot*!\n\n"
-        "I use 90-minute sleep cycles to help you wake up feeling refreshed.\n\n"
-        "What would you like to do?"
-    )
-    await update.message.reply_text(
-        text, parse_mode="Markdown", reply_markup=main_menu_keyboard()
-    )
+    await update.message.reply_text(_START_TEXT, **_REPLY_KW)
 
 
 async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    text = (
-        "*Sleep Calculator Bot – Help*\n\n"
-        "📌 *Commands*\n"
-        "/start – Show the main menu\n"
-        "/wake – Calculate bedtimes for a desired wake-up time\n"
-        "/sleep – Calculate wake-up times for a given bedtime\n"
-        "/now – Calculate wake-up times if you sleep right now\n"
-        "/info – Learn about sleep cycles\n"
-        "/help – Show this message\n\n"
-        "📌 *Time formats accepted*\n"
-        "`7:30 AM`  `7:30 am`  `07:30`  `22:00`"
-    )
-    await update.message.reply_text(text, parse_mode="Markdown")
+    await update.message.reply_text(_HELP_TEXT, parse_mode=ParseMode.MARKDOWN)
 
 
-async def wake_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    await update.message.reply_text(
-        "⏰ What time do you want to *wake up*?\n\nExamples: `7:00 AM`, `06:30`, `7:30 am`",
-        parse_mode="Markdown",
-    )
-    return WAITING_FOR_WAKE_TIME
+async def wake_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    await update.message.reply_text(_ASK_WAKE_PROMPT, parse_mode=ParseMode.MARKDOWN)
+    context.user_data["expecting"] = "wake"
 
 
-async def sleep_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    await update.message.reply_text(
-        "🛏 What time are you planning to *go to bed*?\n\nExamples: `10:30 PM`, `22:30`, `11 pm`",
-        parse_mode="Markdown",
-    )
-    return WAITING_FOR_SLEEP_TIME
+async def sleep_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    await update.message.reply_text(_ASK_SLEEP_PROMPT, parse_mode=ParseMode.MARKDOWN)
+    context.user_data["expecting"] = "sleep"
 
 
 async def now_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     now = now_local()
-    wake_times = calculate_wake_times(now)
-    msg = build_wake_message(wake_times, now)
-    await update.message.reply_text(msg, parse_mode="Markdown", reply_markup=main_menu_keyboard())
+    msg = _rendered_wake_msg(now.hour, now.minute)
+    await update.message.reply_text(msg, **_REPLY_KW)
 
 
 async def info_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    text = (
-        "🧠 *About Sleep Cycles*\n\n"
-        "Your sleep consists of repeated ~90-minute cycles, each containing:\n"
-        "• Light sleep\n"
-        "• Deep sleep (REM)\n\n"
-        "Waking up *between* cycles (not in the middle) means you feel rested.\n\n"
-        "✅ *Ideal sleep* = 4–6 full cycles\n"
-        "⏰ *6 cycles* = 9 hours  (most refreshing)\n"
-        "⏰ *5 cycles* = 7.5 hours (recommended)\n"
-        "⏰ *4 cycles* = 6 hours   (minimum)\n\n"
-        "💡 An average person takes ~14 minutes to fall asleep, so that's built into every calculation."
-    )
-    await update.message.reply_text(text, parse_mode="Markdown", reply_markup=main_menu_keyboard())
+    await update.message.reply_text(_INFO_TEXT, **_REPLY_KW)
 
 
 # ── Conversation handlers ─────────────────────────────────────────────────────
 
-async def receive_wake_time(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+async def receive_wake_time(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     user_input = update.message.text
     wake_time = parse_time(user_input)
     if wake_time is None:
-        await update.message.reply_text(
-            "❌ I couldn't understand that time.\nTry formats like `7:30 AM`, `07:30`, or `22:00`.",
-            parse_mode="Markdown",
-        )
-        return WAITING_FOR_WAKE_TIME
+        await update.message.reply_text(_PARSE_FAIL_WAKE, parse_mode=ParseMode.MARKDOWN)
+        context.user_data["expecting"] = "wake"  # ask again
+        return
 
-    bedtimes = calculate_bedtimes(wake_time)
-    msg = build_bedtime_message(bedtimes, wake_time)
-    await update.message.reply_text(msg, parse_mode="Markdown", reply_markup=main_menu_keyboard())
-    return ConversationHandler.END
+    msg = _rendered_bedtime_msg(wake_time.hour, wake_time.minute)
+    await update.message.reply_text(msg, **_REPLY_KW)
 
 
-async def receive_sleep_time(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+async def receive_sleep_time(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     user_input = update.message.text
     sleep_time = parse_time(user_input)
     if sleep_time is None:
-        await update.message.reply_text(
-            "❌ I couldn't understand that time.\nTry formats like `10:30 PM`, `22:30`, or `23:00`.",
-            parse_mode="Markdown",
-        )
-        return WAITING_FOR_SLEEP_TIME
+        await update.message.reply_text(_PARSE_FAIL_SLEEP, parse_mode=ParseMode.MARKDOWN)
+        context.user_data["expecting"] = "sleep"  # ask again
+        return
 
-    wake_times = calculate_wake_times(sleep_time)
-    msg = build_wake_message(wake_times, sleep_time)
-    await update.message.reply_text(msg, parse_mode="Markdown", reply_markup=main_menu_keyboard())
-    return ConversationHandler.END
+    msg = _rendered_wake_msg(sleep_time.hour, sleep_time.minute)
+    await update.message.reply_text(msg, **_REPLY_KW)
 
 
-async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    context.user_data.pop("expecting", None)
     await update.message.reply_text("❌ Cancelled.", reply_markup=main_menu_keyboard())
-    return ConversationHandler.END
 
 
 # ── Callback query handler (inline buttons) ───────────────────────────────────
 
-async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+async def _on_ask_wake(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     query = update.callback_query
     await query.answer()
+    await query.message.reply_text(_ASK_WAKE_PROMPT, parse_mode=ParseMode.MARKDOWN)
+    context.user_data["expecting"] = "wake"
 
-    if query.data == "ask_wake":
-        await query.message.reply_text(
-            "⏰ What time do you want to *wake up*?\n\nExamples: `7:00 AM`, `06:30`, `7:30 am`",
-            parse_mode="Markdown",
-        )
-        context.user_data["expecting"] = "wake"
-        return WAITING_FOR_WAKE_TIME
 
-    elif query.data == "ask_sleep":
-        await query.message.reply_text(
-            "🛏 What time are you planning to *go to bed*?\n\nExamples: `10:30 PM`, `22:30`, `11 pm`",
-            parse_mode="Markdown",
-        )
-        context.user_data["expecting"] = "sleep"
-        return WAITING_FOR_SLEEP_TIME
+async def _on_ask_sleep(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    query = update.callback_query
+    await query.answer()
+    await query.message.reply_text(_ASK_SLEEP_PROMPT, parse_mode=ParseMode.MARKDOWN)
+    context.user_data["expecting"] = "sleep"
 
-    elif query.data == "sleep_now":
-        now = now_local()
-        wake_times = calculate_wake_times(now)
-        msg = build_wake_message(wake_times, now)
-        await query.message.reply_text(msg, parse_mode="Markdown", reply_markup=main_menu_keyboard())
-        return ConversationHandler.END
-
-    elif query.data == "info":
-        text = (
-            "🧠 *About Sleep Cycles*\n\n"
-            "Your sleep consists of repeated ~90-minute cycles, each containing:\n"
-            "• Light sleep\n"
-            "• Deep sleep (REM)\n\n"
-            "Waking up *between* cycles (not in the middle) means you feel rested.\n\n"
-            "✅ *Ideal sleep* = 4–6 full cycles\n"
-            "⏰ *6 cycles* = 9 hours  (most refreshing)\n"
-            "⏰ *5 cycles* = 7.5 hours (recommended)\n"
-            "⏰ *4 cycles* = 6 hours   (minimum)\n\n"
-            "💡 An average person takes ~14 minutes to fall asleep, so that's built into every calculation."
-        )
-        await query.message.reply_text(text, parse_mode="Markdown", reply_markup=main_menu_keyboard())
-        return ConversationHandler.END
 
-    return ConversationHandler.END
+async def _on_sleep_now(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    query = update.callback_query
+    await query.answer()
+    now = now_local()
+    msg = _rendered_wake_msg(now.hour, now.minute)
+    await query.message.reply_text(msg, **_REPLY_KW)
+
+
+async def _on_info(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    query = update.callback_query
+    await query.answer()
+    await query.message.reply_text(_INFO_TEXT, **_REPLY_KW)
+
 
+async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Acknowledge callbacks that none of the button handlers above claimed."""
+    await update.callback_query.answer()
 
-async def message_router(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+
+async def message_router(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Route free-text messages based on what the bot is currently expecting."""
-    expecting = context.user_data.get("expecting")
+    expecting = context.user_data.pop("expecting", None)
     if expecting == "wake":
-        context.user_data.pop("expecting", None)
-        return await receive_wake_time(update, context)
+        await receive_wake_time(update, context)
     elif expecting == "sleep":
-        context.user_data.pop("expecting", None)
-        return await receive_sleep_time(update, context)
+        await receive_sleep_time(update, context)
     else:
         # Default: try to parse as a time and calculate both options
         parsed = parse_time(update.message.text)
         if parsed:
-            bedtimes = calculate_bedtimes(parsed)
-            wake_times = calculate_wake_times(parsed)
-            msg = (
-                build_bedtime_message(bedtimes, parsed)
-                + "\n\n────────────────────\n\n"
-                + build_wake_message(wake_times, parsed)
-            )
-            await update.message.reply_text(msg, parse_mode="Markdown", reply_markup=main_menu_keyboard())
+            msg = _rendered_both_msg(parsed.hour, parsed.minute)
+            await update.message.reply_text(msg, **_REPLY_KW)
         else:
-            await update.message.reply_text(
-                "🤔 I didn't understand that. Use /start to open the menu or type a time like `7:30 AM`.",
-                parse_mode="Markdown",
-                reply_markup=main_menu_keyboard(),
-            )
-    return ConversationHandler.END
+            await update.message.reply_text(_PARSE_FAIL_DEFAULT, **_REPLY_KW)
+
+
+# ── Networking ────────────────────────────────────────────────────────────────
+
+class _FastJSONRequest(HTTPXRequest):
+    """HTTPXRequest that decodes Bot API responses with orjson when available."""
+
+    @staticmethod
+    def parse_json_payload(payload: bytes) -> dict:
+        if orjson is not None:
+            try:
+                return orjson.loads(payload)
+            except orjson.JSONDecodeError:
+                pass  # let PTB's decoder log it and raise TelegramError
+        return HTTPXRequest.parse_json_payload(payload)
 
 
 # ── Main ──────────────────────────────────────────────────────────────────────
 
 def main() -> None:
-    asyncio.set_event_loop(asyncio.new_event_loop())
-    app = Application.builder().token(BOT_TOKEN).build()
-
-    # Conversation handler for text-based multi-step flows only
-    conv_handler = ConversationHandler(
-        entry_points=[
-            CommandHandler("wake", wake_command),
-            CommandHandler("sleep", sleep_command),
-        ],
-        states={
-            WAITING_FOR_WAKE_TIME: [
-                MessageHandler(filters.TEXT & ~filters.COMMAND, receive_wake_time)
-            ],
-            WAITING_FOR_SLEEP_TIME: [
-                MessageHandler(filters.TEXT & ~filters.COMMAND, receive_sleep_time)
-            ],
-        },
-        fallbacks=[CommandHandler("cancel", cancel)],
+    if uvloop is not None:
+        # libuv-backed loop: cheaper socket I/O and task wakeups than asyncio's
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+
+    # Process updates concurrently so one user's Bot API round-trip doesn't
+    # hold up everyone else's replies. A large keep-alive HTTP/2 pool reuses
+    # TLS connections, and the rate limiter queues sends instead of tripping
+    # 429 retries.
+    app = (
+        Application.builder()
+        .token(BOT_TOKEN)
+        .concurrent_updates(True)
+        .request(_FastJSONRequest(connection_pool_size=256, pool_timeout=5, http_version="2"))
+        .get_updates_request(_FastJSONRequest(http_version="2"))
+        .rate_limiter(AIORateLimiter())
+        .build()
     )
 
-    app.add_handler(CommandHandler("start", start))
-    app.add_handler(CommandHandler("help", help_command))
-    app.add_handler(CommandHandler("now", now_command))
-    app.add_handler(CommandHandler("info", info_command))
-    app.add_handler(CallbackQueryHandler(button_handler))
-    app.add_handler(conv_handler)
-    # Catch-all for free-text (outside conversation)
-    app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, message_router))
-
-    logger.info("Bot is running…")
-    app.run_polling(allowed_updates=Update.ALL_TYPES)
+    app.add_handler(CommandHandler("start", start, block=False))
+    app.add_handler(CommandHandler("help", help_command, block=False))
+    app.add_handler(CommandHandler("now", now_command, block=False))
+    app.add_handler(CommandHandler("info", info_command, block=False))
+    app.add_handler(CommandHandler("wake", wake_command, block=False))
+    app.add_handler(CommandHandler("sleep", sleep_command, block=False))
+    app.add_handler(CommandHandler("cancel", cancel, block=False))
+    app.add_handler(CallbackQueryHandler(_on_ask_wake, pattern=r"^ask_wake$", block=False))
+    app.add_handler(CallbackQueryHandler(_on_ask_sleep, pattern=r"^ask_sleep$", block=False))
+    app.add_handler(CallbackQueryHandler(_on_sleep_now, pattern=r"^sleep_now$", block=False))
+    app.add_handler(CallbackQueryHandler(_on_info, pattern=r"^info$", block=False))
+    app.add_handler(CallbackQueryHandler(button_handler, block=False))
+    # All free text: answers to /wake and /sleep, or a bare time
+    app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, message_router, block=False))
+
+    if WEBHOOK_HOST:
+        # Telegram pushes updates to us; no idle getUpdates round-trips.
+        logger.info("Bot is running (webhook on port %d)…", PORT)
+        app.run_webhook(
+            listen="0.0.0.0",
+            port=PORT,
+            url_path=BOT_TOKEN,
+            webhook_url=f"https://{WEBHOOK_HOST}/{BOT_TOKEN}",
+            allowed_updates=Update.ALL_TYPES,
+        )
+    else:
+        logger.info("Bot is running (polling)…")
+        app.run_polling(allowed_updates=Update.ALL_TYPES)
 
 
 if __name__ == "__main__":
@@ -7,3 +7,11 @@
 import os
 
 BOT_TOKEN = os.environ.get("BOT_TOKEN", "8717170916:AAGLDi_oFQd5PFDlVPjr8_7OAUoW0AZ3B0w")
+
+# Public hostname the bot is reachable at (e.g. "sleepbot.up.railway.app").
+# When set, the bot receives updates via webhook instead of long polling.
+# Railway exposes this as RAILWAY_PUBLIC_DOMAIN once a domain is generated.
+WEBHOOK_HOST = os.environ.get("WEBHOOK_HOST") or os.environ.get("RAILWAY_PUBLIC_DOMAIN")
+
+# Port the webhook server listens on (Railway/Heroku provide PORT).
+PORT = int(os.environ.get("PORT", "8443"))